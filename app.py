@@ -2,18 +2,34 @@ import os
 import io
 import csv
 import json
+import numpy as np
 import pandas as pd
-from flask import Flask, render_template_string, request, jsonify, send_file
+from flask import Flask, Response, render_template_string, request, jsonify, send_file, abort, g
+import joblib
 from sklearn.feature_extraction.text import TfidfVectorizer
 from sklearn.linear_model import LogisticRegression
 from sklearn.pipeline import Pipeline
-from sklearn.model_selection import train_test_split
-from sklearn.metrics import accuracy_score
 from wordcloud import WordCloud
 import base64
 import speech_recognition as sr
 import tempfile
+import gzip
+import hashlib
+import mimetypes
+import threading
+import uuid
+import sqlite3
+import importlib.util
+from contextlib import closing
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor
 from pydub import AudioSegment
+from train import load_training_data, train_model
+
+try:
+    import brotli
+except ImportError:
+    brotli = None  # Assets are still served precompressed with gzip
 
 # --- Pydub path configuration ---
 try:
@@ -22,65 +38,325 @@ try:
 except Exception as e:
     print(f"Warning: Could not set FFmpeg paths. Voice analysis may fail. Error: {e}")
 
-app = Flask(__name__)
+# Static files are prebuilt and served from memory by serve_asset() below
+app = Flask(__name__, static_folder=None)
+
+# --- Step 1 & 2: Load a trained model, or train one from train.csv (see train.py) ---
+model_path = os.environ.get("SHOPINION_MODEL_PATH", os.path.join(os.path.dirname(__file__), 'model.joblib'))
+if os.path.exists(model_path):
+    artifact = joblib.load(model_path)
+    model = artifact["model"]
+    model_info = {"accuracy": f"{artifact['accuracy']:.2f}"}
+    print(f"Loaded trained model from {model_path} ({artifact['params']})")
+else:
+    try:
+        train_data_path = os.environ.get("SHOPINION_TRAIN_CSV", os.path.join(os.path.dirname(__file__), 'train.csv'))
+        X, y = load_training_data(train_data_path)
+        model, model_accuracy = train_model(X, y)
+        model_info = {"accuracy": f"{model_accuracy:.2f}"}
 
-# --- Step 1: Load and Prepare Training Data from CSV ---
-try:
-    train_data_path = os.path.join(os.path.dirname(__file__), 'train.csv')
-    df = pd.read_csv(train_data_path)
-    df.dropna(subset=['Review Text'], inplace=True)
-
-    def map_rating_to_sentiment(rating):
-        if rating in [4, 5]:
-            return 'Positive'
-        elif rating == 3:
-            return 'Neutral'
-        elif rating in [1, 2]:
-            return 'Negative'
-        return None
+        print("Model trained successfully on train.csv!")
+        print(f"Model accuracy on test set: {model_accuracy:.2f}")
 
-    df['sentiment'] = df['Rating'].apply(map_rating_to_sentiment)
-    df.dropna(subset=['sentiment'], inplace=True)
-
-    X = df['Review Text']
-    y = df['sentiment']
-
-    # --- Step 2: Train ML Model (Logistic Regression with TF-IDF) ---
-    X_train, X_test, y_train, y_test = train_test_split(X, y, test_size=0.2, random_state=42)
-
-    model = Pipeline([
-        ("tfidf", TfidfVectorizer()),
-        ("logreg", LogisticRegression(max_iter=1000))
-    ])
-    model.fit(X_train, y_train)
-
-    # Calculate and store model accuracy for display
-    y_pred = model.predict(X_test)
-    model_accuracy = accuracy_score(y_test, y_pred)
-    model_info = {"accuracy": f"{model_accuracy:.2f}"}
-
-    print("Model trained successfully on train.csv!")
-    print(f"Model accuracy on test set: {model_accuracy:.2f}")
-
-except FileNotFoundError:
-    print("Error: 'train.csv' not found. Please ensure your training data file is in the same directory.")
-    X = ["sample review for training"]
-    y = ["Neutral"]
-    model = Pipeline([("tfidf", TfidfVectorizer()), ("logreg", LogisticRegression())])
-    model.fit(X, y)
-    model_info = {"accuracy": "N/A"}
-
-except KeyError as e:
-    print(f"Error: A required column was not found in the CSV file. Missing column: {e}")
-    X = ["sample review for training"]
-    y = ["Neutral"]
-    model = Pipeline([("tfidf", TfidfVectorizer()), ("logreg", LogisticRegression())])
-    model.fit(X, y)
-    model_info = {"accuracy": "N/A"}
+    except FileNotFoundError:
+        print("Error: 'train.csv' not found. Please ensure your training data file is in the same directory.")
+        X = ["sample review for training"]
+        y = ["Neutral"]
+        model = Pipeline([("tfidf", TfidfVectorizer()), ("logreg", LogisticRegression())])
+        model.fit(X, y)
+        model_info = {"accuracy": "N/A"}
+
+    except KeyError as e:
+        print(f"Error: A required column was not found in the CSV file. Missing column: {e}")
+        X = ["sample review for training"]
+        y = ["Neutral"]
+        model = Pipeline([("tfidf", TfidfVectorizer()), ("logreg", LogisticRegression())])
+        model.fit(X, y)
+        model_info = {"accuracy": "N/A"}
+
+# --- Prediction Explanations ---
+# Class probabilities and the terms that pushed each review toward its predicted class,
+# computed for a whole batch in one pass over the sparse TF-IDF matrix and coef_.
+DEFAULT_TOP_K = 5
+MAX_TOP_K = 50
+feature_names = model.named_steps["tfidf"].get_feature_names_out()
+
+def predict_with_explanations(texts, top_k=DEFAULT_TOP_K):
+    """Return (labels, explanations), one {"probabilities", "top_terms"} dict per text."""
+    tfidf = model.named_steps["tfidf"]
+    logreg = model.named_steps["logreg"]
+    X = tfidf.transform(texts).tocsr()
+    probabilities = logreg.predict_proba(X)
+    predicted = probabilities.argmax(axis=1)
+
+    coef = logreg.coef_
+    if coef.shape[0] == 1:
+        # Binary models keep a single row of weights, pointing toward classes_[1]
+        coef = np.vstack([-coef[0], coef[0]])
+
+    # Contribution of every non-zero entry toward its own review's predicted class
+    rows = np.repeat(np.arange(X.shape[0]), np.diff(X.indptr))
+    contributions = X.data * coef[predicted[rows], X.indices]
+
+    # Order entries by review, then by descending contribution. Rows are already grouped,
+    # so an entry's rank within its review is its offset from that review's indptr start.
+    order = np.lexsort((-contributions, rows))
+    rank = np.arange(len(order)) - X.indptr[rows]
+    keep = order[(rank < top_k) & (contributions[order] > 0)]
+    bounds = np.searchsorted(rows[keep], np.arange(1, X.shape[0]))
+    terms = np.split(feature_names[X.indices[keep]], bounds)
+    weights = np.split(contributions[keep].round(4), bounds)
+
+    classes = logreg.classes_.tolist()
+    explanations = [
+        {
+            "probabilities": dict(zip(classes, row_probabilities)),
+            "top_terms": [{"term": t, "weight": w} for t, w in zip(row_terms.tolist(), row_weights.tolist())],
+        }
+        for row_probabilities, row_terms, row_weights in zip(probabilities.round(4).tolist(), terms, weights)
+    ]
+    return logreg.classes_[predicted], explanations
+
+def explain_options(source):
+    """Read the optional explain/top_k parameters from a JSON body or form, falling back to the query string."""
+    explain = source.get("explain", request.args.get("explain", False))
+    if isinstance(explain, str):
+        explain = explain.lower() in ("1", "true", "yes")
+    try:
+        top_k = int(source.get("top_k", request.args.get("top_k", DEFAULT_TOP_K)))
+    except (TypeError, ValueError):
+        top_k = DEFAULT_TOP_K
+    return bool(explain), min(max(top_k, 0), MAX_TOP_K)
 
 # --- Speech Recognition Setup ---
 r = sr.Recognizer()
 
+# --- Execution Pools ---
+# Blocking work is handed to bounded pools instead of running on the request thread:
+# audio decoding and Google Speech Recognition (I/O-bound) go to io_pool, while
+# model.predict and WordCloud rendering (CPU-bound) go to cpu_pool.
+IO_WORKERS = int(os.environ.get("SHOPINION_IO_WORKERS", 32))
+CPU_WORKERS = int(os.environ.get("SHOPINION_CPU_WORKERS", os.cpu_count() or 2))
+INTERACTIVE, BULK = 0, 1
+
+class PriorityScheduler:
+    """A fixed pool of worker threads that always runs queued interactive tasks before bulk ones.
+
+    Bulk tasks may occupy at most workers - reserved_interactive threads, so a burst of
+    bulk work can never leave an interactive prediction waiting for a free worker. The pool
+    is grown to reserved_interactive + 1 threads if needed so bulk work can still run.
+    """
+
+    def __init__(self, workers, reserved_interactive=1, name="shopinion-cpu"):
+        self.workers = max(workers, reserved_interactive + 1)
+        self.bulk_slots = self.workers - reserved_interactive
+        self._cond = threading.Condition()
+        self._queues = {INTERACTIVE: deque(), BULK: deque()}
+        self._running = {INTERACTIVE: 0, BULK: 0}
+        self._shutdown = False
+        for i in range(self.workers):
+            threading.Thread(target=self._work, name=f"{name}-{i}", daemon=True).start()
+
+    def submit(self, fn, *args, priority=BULK):
+        future = Future()
+        with self._cond:
+            if self._shutdown:
+                raise RuntimeError("cannot schedule new tasks after shutdown")
+            self._queues[priority].append((future, fn, args))
+            self._cond.notify()
+        return future
+
+    def _next_priority(self):
+        if self._queues[INTERACTIVE]:
+            return INTERACTIVE
+        if self._queues[BULK] and self._running[BULK] < self.bulk_slots:
+            return BULK
+        return None
+
+    def _work(self):
+        while True:
+            with self._cond:
+                while (priority := self._next_priority()) is None and not self._shutdown:
+                    self._cond.wait()
+                if priority is None:
+                    return
+                future, fn, args = self._queues[priority].popleft()
+                self._running[priority] += 1
+            try:
+                if future.set_running_or_notify_cancel():
+                    try:
+                        future.set_result(fn(*args))
+                    except BaseException as e:
+                        future.set_exception(e)
+            finally:
+                with self._cond:
+                    self._running[priority] -= 1
+                    self._cond.notify_all()
+
+    def stats(self):
+        with self._cond:
+            return {
+                "workers": self.workers,
+                "bulk_slots": self.bulk_slots,
+                "queued": {"interactive": len(self._queues[INTERACTIVE]), "bulk": len(self._queues[BULK])},
+                "running": {"interactive": self._running[INTERACTIVE], "bulk": self._running[BULK]},
+            }
+
+    def shutdown(self, wait=False):
+        with self._cond:
+            self._shutdown = True
+            self._cond.notify_all()
+
+io_pool = ThreadPoolExecutor(max_workers=IO_WORKERS, thread_name_prefix="shopinion-io")
+cpu_pool = PriorityScheduler(CPU_WORKERS)
+
+# --- Admission Control ---
+# Every expensive endpoint has a budget of requests in flight. Past that budget a request is
+# turned away at once with 429 and Retry-After rather than queued, and oversized uploads are
+# refused with 413 before they are parsed.
+ENDPOINT_CLASSES = {
+    "/predict_sentiment": "interactive",
+    "/analyze_voice": "voice",
+    "/analyze_reviews": "bulk",
+    "/download_results": "bulk",
+}
+ADMISSION_LIMITS = {
+    "interactive": int(os.environ.get("SHOPINION_INTERACTIVE_CONCURRENCY", 32)),
+    # Every admitted voice request holds an io_pool thread, so the budget never exceeds the pool
+    "voice": min(int(os.environ.get("SHOPINION_VOICE_CONCURRENCY", IO_WORKERS)), IO_WORKERS),
+    "bulk": int(os.environ.get("SHOPINION_BULK_CONCURRENCY", 2)),
+}
+RETRY_AFTER_SECONDS = {"interactive": 1, "voice": 10, "bulk": 30}
+MAX_UPLOAD_BYTES = {
+    "interactive": 64 * 1024,
+    "voice": int(float(os.environ.get("SHOPINION_MAX_AUDIO_MB", 25)) * 1024 * 1024),
+    "bulk": int(float(os.environ.get("SHOPINION_MAX_CSV_MB", 20)) * 1024 * 1024),
+}
+MAX_BULK_ROWS = int(os.environ.get("SHOPINION_MAX_BULK_ROWS", 100000))
+
+# Hard cap for any request body, including chunked uploads that send no Content-Length
+app.config["MAX_CONTENT_LENGTH"] = max(MAX_UPLOAD_BYTES.values())
+
+admission_lock = threading.Lock()
+admission_stats = {name: {"in_flight": 0, "admitted": 0, "rejected": 0} for name in ADMISSION_LIMITS}
+
+@app.before_request
+def admit_request():
+    endpoint_class = ENDPOINT_CLASSES.get(request.path)
+    if endpoint_class is None:
+        return None
+
+    if request.content_length and request.content_length > MAX_UPLOAD_BYTES[endpoint_class]:
+        limit_mb = MAX_UPLOAD_BYTES[endpoint_class] / (1024 * 1024)
+        return jsonify({"error": f"Upload too large. The limit for this endpoint is {limit_mb:.1f} MB."}), 413
+
+    with admission_lock:
+        stats = admission_stats[endpoint_class]
+        if stats["in_flight"] >= ADMISSION_LIMITS[endpoint_class]:
+            stats["rejected"] += 1
+            retry_after = RETRY_AFTER_SECONDS[endpoint_class]
+            return (jsonify({"error": f"Server is busy. Please retry in {retry_after} seconds."}), 429,
+                    {"Retry-After": str(retry_after)})
+        stats["in_flight"] += 1
+        stats["admitted"] += 1
+    g.admitted_class = endpoint_class
+
+@app.teardown_request
+def release_request(exc=None):
+    endpoint_class = g.pop("admitted_class", None)
+    if endpoint_class is not None:
+        with admission_lock:
+            admission_stats[endpoint_class]["in_flight"] -= 1
+
+@app.errorhandler(413)
+def request_too_large(e):
+    return jsonify({"error": "Upload too large."}), 413
+
+# --- Sentiment Trend Store ---
+# Bulk uploads that carry a date column are appended to a columnar store (one Parquet
+# file per upload) and rolled up incrementally into daily/weekly counts per product and
+# sentiment. The rollups live in SQLite: each upload upserts only the buckets it touches,
+# and every worker process reads and writes the same file, so no update is lost. Trend
+# queries are answered from the rollups only, never from the raw rows.
+TREND_STORE_DIR = os.environ.get("SHOPINION_TREND_DIR", os.path.join(os.path.dirname(__file__), 'trend_store'))
+TREND_DB_PATH = os.path.join(TREND_STORE_DIR, 'rollups.sqlite3')
+TREND_GRANULARITIES = ("day", "week")
+ALL_PRODUCTS = "__all__"
+SENTIMENTS = ["Positive", "Negative", "Neutral"]
+DATE_COLUMN_CANDIDATES = ["Date", "Review Date", "Timestamp", "date", "review_date", "timestamp"]
+PRODUCT_COLUMN_CANDIDATES = ["Product ID", "Clothing ID", "SKU", "Product", "product_id", "sku", "product"]
+
+PARQUET_ENGINE = next((engine for engine in ("pyarrow", "fastparquet") if importlib.util.find_spec(engine)), None)
+if PARQUET_ENGINE is None:
+    print("Warning: No Parquet engine (pyarrow or fastparquet) installed. Raw trend rows will not be stored; rollups still work.")
+
+def connect_trend_db():
+    connection = sqlite3.connect(TREND_DB_PATH, timeout=30)
+    connection.execute("PRAGMA journal_mode=WAL")
+    return connection
+
+os.makedirs(TREND_STORE_DIR, exist_ok=True)
+with closing(connect_trend_db()) as connection, connection:
+    connection.execute("""
+        CREATE TABLE IF NOT EXISTS rollups (
+            granularity TEXT NOT NULL,
+            product TEXT NOT NULL,
+            period TEXT NOT NULL,
+            sentiment TEXT NOT NULL,
+            count INTEGER NOT NULL,
+            PRIMARY KEY (granularity, product, period, sentiment)
+        )""")
+
+def find_column(columns, candidates, requested=None):
+    if requested:
+        return requested if requested in columns else None
+    return next((c for c in candidates if c in columns), None)
+
+def record_trends(frame):
+    """Append analyzed rows (review, sentiment, date[, product]) to the trend store.
+
+    Returns the number of rows that carried a usable date and were rolled up.
+    """
+    frame = frame.copy()
+    # Parse each value on its own: uploads mix formats and UTC offsets, and rollups are kept in UTC
+    frame['date'] = pd.to_datetime(frame['date'], errors='coerce', utc=True, format='mixed')
+    frame.dropna(subset=['date'], inplace=True)
+    if frame.empty:
+        return 0
+    if 'product' in frame.columns:
+        product = frame['product']
+        # A blank cell makes pandas read a numeric ID column as float; key it "5", not "5.0"
+        if pd.api.types.is_float_dtype(product) and (product.dropna() % 1 == 0).all():
+            product = product.astype('Int64')
+        frame['product'] = product.astype(str).where(product.notna(), 'unknown')
+
+    day = frame['date'].dt.normalize()
+    periods = {
+        "day": day.dt.strftime('%Y-%m-%d'),
+        "week": (day - pd.to_timedelta(day.dt.weekday, unit='D')).dt.strftime('%Y-%m-%d'),
+    }
+
+    # Count the whole batch with one groupby per granularity, then upsert only those buckets
+    batch_counts = []
+    for granularity, period in periods.items():
+        keyed = frame.assign(period=period)
+        totals = keyed.groupby(['period', 'sentiment']).size()
+        batch_counts.extend((granularity, ALL_PRODUCTS, p, s, int(n)) for (p, s), n in totals.items())
+        if 'product' in keyed.columns:
+            per_product = keyed.groupby(['product', 'period', 'sentiment']).size()
+            batch_counts.extend((granularity, prod, p, s, int(n)) for (prod, p, s), n in per_product.items())
+
+    with closing(connect_trend_db()) as connection, connection:
+        connection.executemany("""
+            INSERT INTO rollups (granularity, product, period, sentiment, count) VALUES (?, ?, ?, ?, ?)
+            ON CONFLICT (granularity, product, period, sentiment) DO UPDATE SET count = count + excluded.count
+            """, batch_counts)
+
+    if PARQUET_ENGINE is not None:
+        frame.to_parquet(os.path.join(TREND_STORE_DIR, f"reviews-{uuid.uuid4().hex}.parquet"), index=False)
+
+    return len(frame)
+
 # --- Updated HTML Template with 'Shopping' and 'Voice' sections ---
 template = """
 <!DOCTYPE html>
@@ -89,8 +365,7 @@ template = """
     <meta charset="UTF-8">
     <meta name="viewport" content="width=device-width, initial-scale=1.0">
     <title>Shopinion - AI Sentiment Analysis</title>
-    <script src="https://cdn.tailwindcss.com"></script>
-    <script src="https://cdn.jsdelivr.net/npm/chart.js"></script>
+    <link rel="stylesheet" href="{{ stylesheet_url }}">
 </head>
 <body class="bg-gray-900 text-gray-100 min-h-screen flex flex-col">
     <nav class="bg-gray-800 shadow-md p-4 sticky top-0 z-50">
@@ -252,7 +527,6 @@ template = """
         let currentInputMethod = null;
         let csvFile = null;
         let analysisData = [];
-        let myChart = null;
 
         const shoppingSites = [
             {
@@ -457,8 +731,9 @@ template = """
                 }
 
                 analysisData = result.analysis;
-                renderResults(analysisData, result.wordcloud_img);
+                // Show the page first so the chart canvas has a measurable size
                 showPage('results');
+                renderResults(analysisData, result.wordcloud_img, result.sentiment_counts);
             } catch (e) {
                 console.error("Analysis failed:", e);
                 alert(e.message || "An error occurred during analysis. Please try again.");
@@ -530,16 +805,19 @@ template = """
             }
         }
 
-        function renderResults(analysis, wordcloudImg) {
+        function renderResults(analysis, wordcloudImg, serverCounts) {
             const individualResultsContainer = document.getElementById('individual-results');
             individualResultsContainer.innerHTML = '';
-            const sentimentCounts = { Positive: 0, Negative: 0, Neutral: 0 };
+            // Counts are aggregated server-side; only fall back to counting here for older responses
+            const sentimentCounts = serverCounts || { Positive: 0, Negative: 0, Neutral: 0 };
 
-            analysis.forEach(item => {
-                if (item.sentiment in sentimentCounts) {
-                    sentimentCounts[item.sentiment]++;
-                }
-            });
+            if (!serverCounts) {
+                analysis.forEach(item => {
+                    if (item.sentiment in sentimentCounts) {
+                        sentimentCounts[item.sentiment]++;
+                    }
+                });
+            }
 
             analysis.forEach(item => {
                 const div = document.createElement('div');
@@ -567,17 +845,40 @@ template = """
         }
 
         function drawPieChart(counts) {
-            const ctx = document.getElementById('sentiment-chart').getContext('2d');
-            if (myChart) myChart.destroy();
-            myChart = new Chart(ctx, {
-                type: 'pie',
-                data: {
-                    labels: ['Positive','Negative','Neutral'],
-                    datasets: [{
-                        data: [counts.Positive, counts.Negative, counts.Neutral],
-                        backgroundColor:['rgb(74,222,128)','rgb(239,68,68)','rgb(156,163,175)']
-                    }]
-                }
+            // Plain canvas pie chart; no charting library to download
+            const canvas = document.getElementById('sentiment-chart');
+            const size = canvas.clientWidth || 300;
+            const ratio = window.devicePixelRatio || 1;
+            canvas.width = size * ratio;
+            canvas.height = size * ratio;
+            canvas.style.height = `${size}px`;
+            const ctx = canvas.getContext('2d');
+            ctx.setTransform(ratio, 0, 0, ratio, 0, 0);
+            ctx.clearRect(0, 0, size, size);
+
+            const slices = [
+                [counts.Positive, 'rgb(74,222,128)'],
+                [counts.Negative, 'rgb(239,68,68)'],
+                [counts.Neutral, 'rgb(156,163,175)']
+            ];
+            const total = slices.reduce((sum, [value]) => sum + value, 0);
+            if (total === 0) return;
+
+            const center = size / 2;
+            let angle = -Math.PI / 2;
+            slices.forEach(([value, color]) => {
+                if (!value) return;
+                const sweep = (value / total) * 2 * Math.PI;
+                ctx.beginPath();
+                ctx.moveTo(center, center);
+                ctx.arc(center, center, center - 2, angle, angle + sweep);
+                ctx.closePath();
+                ctx.fillStyle = color;
+                ctx.fill();
+                ctx.strokeStyle = 'rgb(31,41,55)';
+                ctx.lineWidth = 2;
+                ctx.stroke();
+                angle += sweep;
             });
         }
 
@@ -646,10 +947,67 @@ template = """
 </html>
 """
 
+def render_wordcloud(text):
+    wordcloud = WordCloud(width=800, height=400, background_color='black', colormap='viridis').generate(text)
+    img_stream = io.BytesIO()
+    wordcloud.to_image().save(img_stream, format='PNG')
+    img_stream.seek(0)
+    return f"data:image/png;base64,{base64.b64encode(img_stream.read()).decode('utf-8')}"
+
+# --- Front-end Assets ---
+# The page shell and static files are built once at startup. Each asset gets a content-hash
+# ETag and precompressed gzip (and brotli, when installed) variants, so a page load is a
+# dictionary lookup rather than a template render.
+STATIC_DIR = os.path.join(os.path.dirname(__file__), 'static')
+
+def build_asset(content, mimetype):
+    asset = {
+        "mimetype": mimetype,
+        "etag": hashlib.sha256(content).hexdigest()[:16],
+        "identity": content,
+        "gzip": gzip.compress(content, compresslevel=9),
+    }
+    if brotli is not None:
+        asset["br"] = brotli.compress(content, quality=11)
+    return asset
+
+def serve_asset(asset, cache_control):
+    encoding = next((e for e in ("br", "gzip") if e in asset and request.accept_encodings[e]), None)
+    etag = f"{asset['etag']}-{encoding}" if encoding else asset["etag"]
+    headers = {"ETag": f'"{etag}"', "Cache-Control": cache_control, "Vary": "Accept-Encoding"}
+    if request.if_none_match.contains(etag):
+        return Response(status=304, headers=headers)
+    if encoding:
+        headers["Content-Encoding"] = encoding
+    return Response(asset[encoding or "identity"], mimetype=asset["mimetype"], headers=headers)
+
+static_assets = {}
+for name in os.listdir(STATIC_DIR):
+    with open(os.path.join(STATIC_DIR, name), 'rb') as f:
+        static_assets[name] = build_asset(f.read(), mimetypes.guess_type(name)[0] or 'application/octet-stream')
+
+with app.app_context():
+    page_html = render_template_string(
+        template, stylesheet_url=f"/static/shopinion.css?v={static_assets['shopinion.css']['etag']}")
+page_asset = build_asset(page_html.encode('utf-8'), 'text/html')
+
 # --- Flask Routes ---
 @app.route("/")
 def home():
-    return render_template_string(template)
+    # Revalidated on every load; the assets it links to are versioned and cached for a year
+    return serve_asset(page_asset, "no-cache")
+
+@app.route("/static/<path:filename>")
+def static_files(filename):
+    if filename not in static_assets:
+        abort(404)
+    return serve_asset(static_assets[filename], "public, max-age=31536000, immutable")
+
+@app.route("/metrics")
+def metrics():
+    with admission_lock:
+        admission = {name: {**stats, "limit": ADMISSION_LIMITS[name]} for name, stats in admission_stats.items()}
+    return jsonify({"admission": admission, "cpu_scheduler": cpu_pool.stats()})
 
 @app.route("/model_accuracy")
 def model_accuracy():
@@ -674,8 +1032,8 @@ def get_csv_headers():
 @app.route("/analyze_reviews", methods=["POST"])
 def analyze_reviews():
     reviews = []
-    wordcloud_img = None
-    
+    trend_columns = None
+
     if 'csv_file' in request.files:
         file = request.files['csv_file']
         # The column name is now hardcoded to "Review Text"
@@ -683,33 +1041,93 @@ def analyze_reviews():
         try:
             df = pd.read_csv(file)
             if column_name and column_name in df.columns:
-                df_reviews = df[column_name].dropna().astype(str)
-                reviews = df_reviews.tolist()
+                df = df.dropna(subset=[column_name])
+                df[column_name] = df[column_name].astype(str)
+                df = df[df[column_name].str.strip() != '']
+                reviews = df[column_name].tolist()
             else:
                 return jsonify({"error": "The required column 'Review Text' was not found in the CSV file."}), 400
         except Exception as e:
             return jsonify({"error": f"Error reading CSV: {str(e)}"}), 400
+
+        # Optional date and product/SKU columns feed the trend rollups
+        date_column = find_column(df.columns, DATE_COLUMN_CANDIDATES, request.form.get("date_column"))
+        product_column = find_column(df.columns, PRODUCT_COLUMN_CANDIDATES, request.form.get("product_column"))
+        if date_column:
+            trend_columns = {"date": df[date_column].tolist()}
+            if product_column:
+                trend_columns["product"] = df[product_column].tolist()
+        explain, top_k = explain_options(request.form)
     else:
         data = request.get_json()
         if data:
             reviews = data.get("reviews", [])
+        explain, top_k = explain_options(data or {})
 
     reviews = [r for r in reviews if r and r.strip()]
     if not reviews:
         return jsonify({"error": "No valid reviews to analyze."}), 400
+    if len(reviews) > MAX_BULK_ROWS:
+        return jsonify({"error": f"Too many reviews ({len(reviews)}). The limit per request is {MAX_BULK_ROWS}."}), 413
     
-    # Generate Word Cloud
-    all_reviews_text = " ".join(reviews)
-    wordcloud = WordCloud(width=800, height=400, background_color='black', colormap='viridis').generate(all_reviews_text)
-    img_stream = io.BytesIO()
-    wordcloud.to_image().save(img_stream, format='PNG')
-    img_stream.seek(0)
-    wordcloud_img = f"data:image/png;base64,{base64.b64encode(img_stream.read()).decode('utf-8')}"
+    # Generate the Word Cloud and predict sentiments in parallel
+    wordcloud_future = cpu_pool.submit(render_wordcloud, " ".join(reviews))
+    if explain:
+        sentiments, explanations = cpu_pool.submit(predict_with_explanations, reviews, top_k).result()
+        analysis_results = [{"review": review, "sentiment": sentiment, **explanation}
+                            for review, sentiment, explanation in zip(reviews, sentiments, explanations)]
+    else:
+        sentiments = cpu_pool.submit(model.predict, reviews).result()
+        analysis_results = [{"review": review, "sentiment": sentiment} for review, sentiment in zip(reviews, sentiments)]
+    wordcloud_img = wordcloud_future.result()
+
+    sentiment_counts = pd.Series(sentiments).value_counts()
+    response = {
+        "analysis": analysis_results,
+        "wordcloud_img": wordcloud_img,
+        "sentiment_counts": {s: int(sentiment_counts.get(s, 0)) for s in SENTIMENTS},
+    }
+
+    if trend_columns:
+        # Trends are a by-product; a failure there must not cost the user the analysis
+        try:
+            response["trend_rows"] = record_trends(pd.DataFrame({"review": reviews, "sentiment": sentiments, **trend_columns}))
+        except Exception as e:
+            app.logger.exception("Recording sentiment trends failed")
+            response["trend_error"] = f"Trends were not recorded: {str(e)}"
+
+    return jsonify(response)
 
-    sentiments = model.predict(reviews)
-    analysis_results = [{"review": review, "sentiment": sentiment} for review, sentiment in zip(reviews, sentiments)]
+@app.route("/sentiment_trends")
+def sentiment_trends():
+    granularity = request.args.get("granularity", "day")
+    if granularity not in TREND_GRANULARITIES:
+        return jsonify({"error": f"Unsupported granularity '{granularity}'. Use one of: {', '.join(TREND_GRANULARITIES)}."}), 400
+    product = request.args.get("product", ALL_PRODUCTS)
 
-    return jsonify({"analysis": analysis_results, "wordcloud_img": wordcloud_img})
+    try:
+        start = pd.Timestamp(request.args["start"]).normalize() if request.args.get("start") else None
+        end = pd.Timestamp(request.args["end"]).strftime('%Y-%m-%d') if request.args.get("end") else None
+    except ValueError as e:
+        return jsonify({"error": f"Invalid date range: {str(e)}"}), 400
+    if start is not None:
+        # Weekly keys are Monday week starts; include the week that contains a mid-week start
+        if granularity == "week":
+            start -= pd.Timedelta(days=start.weekday())
+        start = start.strftime('%Y-%m-%d')
+
+    with closing(connect_trend_db()) as connection:
+        rows = connection.execute("""
+            SELECT period, sentiment, count FROM rollups
+            WHERE granularity = ? AND product = ? AND period >= ? AND period <= ?
+            ORDER BY period
+            """, (granularity, product, start or "", end or "9999-12-31")).fetchall()
+
+    periods = {}
+    for period, sentiment, count in rows:
+        periods.setdefault(period, {})[sentiment] = count
+    series = [{"period": p, **{s: counts.get(s, 0) for s in SENTIMENTS}} for p, counts in periods.items()]
+    return jsonify({"granularity": granularity, "product": product, "series": series})
 
 @app.route("/predict_sentiment", methods=["POST"])
 def predict_sentiment():
@@ -718,9 +1136,35 @@ def predict_sentiment():
     if not review or not review.strip():
         return jsonify({"error": "No review provided."}), 400
     
-    sentiment = model.predict([review])[0]
+    explain, top_k = explain_options(data)
+    if explain:
+        sentiments, explanations = cpu_pool.submit(predict_with_explanations, [review], top_k, priority=INTERACTIVE).result()
+        return jsonify({"sentiment": sentiments[0], **explanations[0]})
+
+    sentiment = cpu_pool.submit(model.predict, [review], priority=INTERACTIVE).result()[0]
     return jsonify({"sentiment": sentiment})
 
+def transcribe_audio(audio_file):
+    """Decode an uploaded WAV/MP3 file and transcribe it with Google Speech Recognition."""
+    # Create a temporary WAV file for SpeechRecognition
+    with tempfile.NamedTemporaryFile(suffix=".wav", delete=False) as temp_wav:
+        audio_path = temp_wav.name
+    try:
+        # Convert any format to WAV using pydub
+        if audio_file.filename.lower().endswith('.mp3'):
+            audio = AudioSegment.from_mp3(audio_file)
+        else:
+            audio = AudioSegment.from_wav(audio_file)
+        audio.export(audio_path, format="wav")
+
+        # Transcribe the WAV file
+        with sr.AudioFile(audio_path) as source:
+            audio_data = r.record(source)
+        return r.recognize_google(audio_data)
+    finally:
+        if os.path.exists(audio_path):
+            os.remove(audio_path)
+
 @app.route("/analyze_voice", methods=["POST"])
 def analyze_voice():
     if 'audio_file' not in request.files:
@@ -729,32 +1173,23 @@ def analyze_voice():
     audio_file = request.files['audio_file']
     if audio_file.filename == '':
         return jsonify({"error": "No selected file."}), 400
+    if not audio_file.filename.lower().endswith(('.mp3', '.wav')):
+        return jsonify({"error": "Unsupported audio format. Please upload a WAV or MP3 file."}), 400
     
     try:
-        # Create a temporary WAV file for SpeechRecognition
-        with tempfile.NamedTemporaryFile(suffix=".wav", delete=False) as temp_wav:
-            audio_path = temp_wav.name
-            # Convert any format to WAV using pydub
-            if audio_file.filename.lower().endswith('.mp3'):
-                audio = AudioSegment.from_mp3(audio_file)
-            elif audio_file.filename.lower().endswith('.wav'):
-                audio = AudioSegment.from_wav(audio_file)
-            else:
-                return jsonify({"error": "Unsupported audio format. Please upload a WAV or MP3 file."}), 400
-            
-            audio.export(audio_path, format="wav")
-
-        # Transcribe the WAV file
-        with sr.AudioFile(audio_path) as source:
-            audio_data = r.record(source)
-        
-        transcribed_text = r.recognize_google(audio_data)
+        transcribed_text = io_pool.submit(transcribe_audio, audio_file).result()
 
         if not transcribed_text:
             return jsonify({"error": "Could not transcribe the audio. The file might be empty or in a format not supported by the model."}), 400
 
         # Predict sentiment of the transcribed text
-        sentiment = model.predict([transcribed_text])[0]
+        explain, top_k = explain_options(request.form)
+        if explain:
+            sentiments, explanations = cpu_pool.submit(predict_with_explanations, [transcribed_text], top_k,
+                                                       priority=INTERACTIVE).result()
+            return jsonify({"transcribed_text": transcribed_text, "sentiment": sentiments[0], **explanations[0]})
+
+        sentiment = cpu_pool.submit(model.predict, [transcribed_text], priority=INTERACTIVE).result()[0]
         
         return jsonify({
             "transcribed_text": transcribed_text,
@@ -768,9 +1203,6 @@ def analyze_voice():
         return jsonify({"error": "FFmpeg or avconv not found. Please ensure it's installed and in your system's PATH, or check the manual path in the Python code."}), 500
     except Exception as e:
         return jsonify({"error": f"An unexpected error occurred: {str(e)}"}), 500
-    finally:
-        if 'audio_path' in locals() and os.path.exists(audio_path):
-            os.remove(audio_path)
 
 @app.route("/download_results", methods=["POST"])
 def download_results():
@@ -0,0 +1,159 @@
+"""Async (ASGI) serving mode for Shopinion.
+
+    uvicorn asgi:application
+
+Request bodies, including CSV and audio uploads, are received on the event loop. Each
+request then runs through the Flask app on a thread. The app's admission control
+(app.ADMISSION_LIMITS) gives each endpoint class a budget of requests in flight and answers
+anything past it with 429 instead of queueing; a full budget is answered before the upload
+is read. Inside the views, speech recognition goes to app.io_pool, and model.predict and
+WordCloud rendering go to app.cpu_pool, which runs interactive predictions ahead of bulk work.
+
+asgiref's WsgiToAsgi is not used: it runs every request on one shared thread.
+"""
+import asyncio
+import json
+import os
+import sys
+from concurrent.futures import ThreadPoolExecutor
+from tempfile import SpooledTemporaryFile
+
+from app import (ADMISSION_LIMITS, ENDPOINT_CLASSES, MAX_UPLOAD_BYTES, RETRY_AFTER_SECONDS, admission_lock,
+                 admission_stats, app, cpu_pool, io_pool)
+
+# Cheap endpoints without an admission budget (page, static files, trends, metrics)
+DEFAULT_CONCURRENCY = int(os.environ.get("SHOPINION_DEFAULT_CONCURRENCY", 16))
+default_semaphore = asyncio.Semaphore(DEFAULT_CONCURRENCY)
+
+# Enough threads for every admitted request plus headroom to answer rejections promptly
+request_pool = ThreadPoolExecutor(max_workers=sum(ADMISSION_LIMITS.values()) + 2 * DEFAULT_CONCURRENCY,
+                                  thread_name_prefix="shopinion-request")
+
+
+def build_environ(scope, body, length):
+    """Translate an ASGI HTTP scope and buffered body of length bytes into a WSGI environ (PEP 3333)."""
+    server_name, server_port = scope.get("server") or ("localhost", 80)
+    environ = {
+        "REQUEST_METHOD": scope["method"],
+        "SCRIPT_NAME": scope.get("root_path", "").encode("utf-8").decode("latin-1"),
+        "PATH_INFO": scope["path"].encode("utf-8").decode("latin-1"),
+        "QUERY_STRING": scope.get("query_string", b"").decode("latin-1"),
+        "SERVER_NAME": server_name,
+        "SERVER_PORT": str(server_port),
+        "SERVER_PROTOCOL": f"HTTP/{scope.get('http_version', '1.1')}",
+        "REMOTE_ADDR": (scope.get("client") or ("", 0))[0],
+        "wsgi.version": (1, 0),
+        "wsgi.url_scheme": scope.get("scheme", "http"),
+        "wsgi.input": body,
+        "wsgi.input_terminated": True,
+        "wsgi.errors": sys.stderr,
+        "wsgi.multithread": True,
+        "wsgi.multiprocess": False,
+        "wsgi.run_once": False,
+    }
+    for raw_name, raw_value in scope.get("headers", []):
+        name = raw_name.decode("latin-1").upper().replace("-", "_")
+        value = raw_value.decode("latin-1")
+        if name in ("CONTENT_TYPE", "CONTENT_LENGTH"):
+            environ[name] = value
+            continue
+        key = f"HTTP_{name}"
+        environ[key] = f"{environ[key]},{value}" if key in environ else value
+    # The body is fully buffered, so its length is known even for chunked uploads that sent none
+    environ["CONTENT_LENGTH"] = str(length)
+    return environ
+
+
+def run_wsgi(environ):
+    """Run the Flask app to completion on the current thread and return (status, headers, body)."""
+    response = {}
+
+    def start_response(status, headers, exc_info=None):
+        response["status"] = int(status.split(" ", 1)[0])
+        response["headers"] = [(k.lower().encode("latin-1"), v.encode("latin-1")) for k, v in headers]
+
+    result = app.wsgi_app(environ, start_response)
+    try:
+        body = b"".join(result)
+    finally:
+        if hasattr(result, "close"):
+            result.close()
+    return response["status"], response["headers"], body
+
+
+def budget_full(endpoint_class):
+    """Retry-After seconds if endpoint_class is at its admission budget, else None.
+
+    Only a fast path for rejecting before the upload is read; the app's admit_request still
+    takes the slot, so a request that passes here can be turned away there.
+    """
+    with admission_lock:
+        stats = admission_stats[endpoint_class]
+        if stats["in_flight"] < ADMISSION_LIMITS[endpoint_class]:
+            return None
+        stats["rejected"] += 1
+        return RETRY_AFTER_SECONDS[endpoint_class]
+
+
+async def send_error(send, status, message, headers=()):
+    content = json.dumps({"error": message}).encode("utf-8")
+    await send({"type": "http.response.start", "status": status,
+                "headers": [(b"content-type", b"application/json"), (b"content-length", str(len(content)).encode()),
+                            *headers]})
+    await send({"type": "http.response.body", "body": content})
+
+
+async def lifespan(receive, send):
+    while True:
+        message = await receive()
+        if message["type"] == "lifespan.startup":
+            await send({"type": "lifespan.startup.complete"})
+        elif message["type"] == "lifespan.shutdown":
+            for pool in (request_pool, io_pool, cpu_pool):
+                pool.shutdown(wait=False)
+            await send({"type": "lifespan.shutdown.complete"})
+            return
+
+
+async def application(scope, receive, send):
+    if scope["type"] == "lifespan":
+        return await lifespan(receive, send)
+    if scope["type"] != "http":
+        raise ValueError(f"Unsupported ASGI scope type: {scope['type']}")
+
+    endpoint_class = ENDPOINT_CLASSES.get(scope["path"])
+    max_bytes = MAX_UPLOAD_BYTES[endpoint_class] if endpoint_class else app.config["MAX_CONTENT_LENGTH"]
+
+    # A full budget is answered before the upload is received, not after
+    if endpoint_class and (retry_after := budget_full(endpoint_class)) is not None:
+        return await send_error(send, 429, f"Server is busy. Please retry in {retry_after} seconds.",
+                                [(b"retry-after", str(retry_after).encode())])
+
+    with SpooledTemporaryFile(max_size=1024 * 1024) as body:
+        # Read the upload on the event loop; no thread is held while the client is sending,
+        # and an oversized upload is refused as soon as it crosses the endpoint's limit
+        received = 0
+        while True:
+            message = await receive()
+            if message["type"] == "http.disconnect":
+                return
+            chunk = message.get("body", b"")
+            received += len(chunk)
+            if received > max_bytes:
+                return await send_error(send, 413, f"Upload too large. The limit for this endpoint is {max_bytes / (1024 * 1024):.1f} MB.")
+            body.write(chunk)
+            if not message.get("more_body"):
+                break
+        body.seek(0)
+
+        loop = asyncio.get_running_loop()
+        environ = build_environ(scope, body, received)
+        if endpoint_class:
+            # Admission control inside the app accepts or rejects these without waiting
+            status, headers, content = await loop.run_in_executor(request_pool, run_wsgi, environ)
+        else:
+            async with default_semaphore:
+                status, headers, content = await loop.run_in_executor(request_pool, run_wsgi, environ)
+
+    await send({"type": "http.response.start", "status": status, "headers": headers})
+    await send({"type": "http.response.body", "body": content})
@@ -0,0 +1,322 @@
+"""Offline performance benchmarks for the Shopinion Flask endpoints.
+
+Everything runs locally: training data, bulk uploads and WAV fixtures are generated,
+and Google Speech Recognition is replaced by a stub recognizer.
+
+    python benchmark.py                   # run and print results
+    python benchmark.py --save-baseline   # record the results as the new baseline
+    python benchmark.py --check           # exit 1 if a metric regressed past --threshold
+"""
+import argparse
+import asyncio
+import csv
+import io
+import json
+import math
+import os
+import platform
+import random
+import statistics
+import struct
+import sys
+import tempfile
+import time
+import wave
+from concurrent.futures import ThreadPoolExecutor
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+DEFAULT_BASELINE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'benchmark_baseline.json')
+
+POSITIVE_WORDS = "love perfect comfortable beautiful soft flattering great gorgeous cozy elegant".split()
+NEGATIVE_WORDS = "terrible awful cheap itchy returned disappointing scratchy poor ripped shrank".split()
+NEUTRAL_WORDS = "okay fine average decent alright expected ordinary standard plain acceptable".split()
+FILLER_WORDS = "the dress fit size fabric color top shirt jeans was is and it this very a bit".split()
+STUB_TRANSCRIPT = "i love this dress the fabric is soft and the fit is perfect"
+
+
+# --- Synthetic data ---
+def synthetic_review(rng, rating):
+    words = POSITIVE_WORDS if rating >= 4 else NEGATIVE_WORDS if rating <= 2 else NEUTRAL_WORDS
+    length = rng.randint(8, 40)
+    return " ".join(rng.choice(words) if rng.random() < 0.3 else rng.choice(FILLER_WORDS) for _ in range(length))
+
+
+def write_train_csv(path, rows, seed=0):
+    """Write a train.csv-shaped file (Clothing ID, Review Text, Rating)."""
+    rng = random.Random(seed)
+    with open(path, 'w', newline='', encoding='utf-8') as f:
+        writer = csv.writer(f)
+        writer.writerow(["Clothing ID", "Review Text", "Rating"])
+        for _ in range(rows):
+            rating = rng.randint(1, 5)
+            writer.writerow([rng.randint(1, 200), synthetic_review(rng, rating), rating])
+
+
+def synthetic_reviews(count, seed=1):
+    rng = random.Random(seed)
+    return [synthetic_review(rng, rng.randint(1, 5)) for _ in range(count)]
+
+
+def synthetic_upload_csv(count, seed=2):
+    """A bulk upload with Date and SKU columns, as bytes."""
+    rng = random.Random(seed)
+    output = io.StringIO()
+    writer = csv.writer(output)
+    writer.writerow(["Date", "SKU", "Review Text"])
+    for _ in range(count):
+        writer.writerow([f"2025-{rng.randint(1, 12):02d}-{rng.randint(1, 28):02d}", f"SKU-{rng.randint(1, 50)}",
+                         synthetic_review(rng, rng.randint(1, 5))])
+    return output.getvalue().encode('utf-8')
+
+
+def synthetic_wav(seconds=2.0, rate=16000):
+    """A mono 16-bit sine tone WAV file, as bytes."""
+    output = io.BytesIO()
+    with wave.open(output, 'wb') as wav:
+        wav.setnchannels(1)
+        wav.setsampwidth(2)
+        wav.setframerate(rate)
+        frames = (int(8000 * math.sin(2 * math.pi * 440 * i / rate)) for i in range(int(seconds * rate)))
+        wav.writeframes(b"".join(struct.pack('<h', frame) for frame in frames))
+    return output.getvalue()
+
+
+# --- Measurement helpers ---
+def timed(fn, *args, **kwargs):
+    start = time.perf_counter()
+    result = fn(*args, **kwargs)
+    return time.perf_counter() - start, result
+
+
+def latencies(fn, repeat):
+    """Wall times of fn in ms over repeat runs, after one untimed warm-up run."""
+    fn()
+    samples = []
+    for _ in range(repeat):
+        elapsed, _ = timed(fn)
+        samples.append(elapsed * 1000)
+    return samples
+
+
+def median_ms(fn, samples):
+    return statistics.median(latencies(fn, samples))
+
+
+def percentile(samples, pct):
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))]
+
+
+def peak_rss_mb():
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is reported in bytes on macOS and in kilobytes elsewhere
+    return peak / (1024 * 1024) if sys.platform == 'darwin' else peak / 1024
+
+
+def check_response(response):
+    if response.status_code != 200:
+        raise RuntimeError(f"{response.request.path} returned {response.status_code}: {response.get_data(as_text=True)[:200]}")
+    return response
+
+
+def asgi_post(application, path, chunks, content_type):
+    """POST chunks as one chunked body (no Content-Length) straight to an ASGI app; returns the body."""
+    messages = [{"type": "http.request", "body": chunk, "more_body": i < len(chunks) - 1} for i, chunk in enumerate(chunks)]
+    sent = []
+
+    async def receive():
+        return messages.pop(0) if messages else {"type": "http.disconnect"}
+
+    async def send(message):
+        sent.append(message)
+
+    scope = {"type": "http", "method": "POST", "path": path, "query_string": b"", "http_version": "1.1",
+             "headers": [(b"content-type", content_type.encode()), (b"transfer-encoding", b"chunked")]}
+    asyncio.run(application(scope, receive, send))
+    if sent[0]["status"] != 200:
+        raise RuntimeError(f"ASGI {path} returned {sent[0]['status']}: {sent[-1]['body'][:200]!r}")
+    return sent[-1]["body"]
+
+
+# --- Benchmarks ---
+def run(args):
+    with tempfile.TemporaryDirectory(prefix='shopinion-bench-') as workdir:
+        return run_in(args, workdir)
+
+
+def run_in(args, workdir):
+    sizes = [int(s) for s in args.sizes.split(',')]
+    train_paths = {}
+    for size in sizes:
+        train_paths[size] = os.path.join(workdir, f'train-{size}.csv')
+        write_train_csv(train_paths[size], size)
+
+    # The app trains at import time, so point it at generated data and a scratch trend store first
+    os.environ["SHOPINION_TRAIN_CSV"] = train_paths[sizes[-1]]
+    os.environ["SHOPINION_TREND_DIR"] = os.path.join(workdir, 'trend_store')
+    os.environ["SHOPINION_MODEL_PATH"] = os.path.join(workdir, 'no-model.joblib')  # always train, never load a saved model
+    import app as shopinion
+    import speech_recognition as sr
+
+    class StubRecognizer(sr.Recognizer):
+        def recognize_google(self, audio_data, *args, **kwargs):
+            return STUB_TRANSCRIPT
+
+    shopinion.r = StubRecognizer()
+    client = shopinion.app.test_client()
+    metrics = {}
+
+    def record(name, value, unit, better="lower"):
+        metrics[name] = {"value": round(value, 4), "unit": unit, "better": better}
+        print(f"{name:<40} {value:>12.3f} {unit}")
+
+    for size in sizes:
+        X, y = shopinion.load_training_data(train_paths[size])
+        record(f"train_seconds[{size}]", median_ms(lambda: shopinion.train_model(X, y), args.samples) / 1000, "s")
+
+    review = synthetic_reviews(1)[0]
+    samples = latencies(lambda: check_response(client.post('/predict_sentiment', json={"review": review})), args.repeat)
+    record("predict_sentiment_p50", percentile(samples, 50), "ms")
+    record("predict_sentiment_p95", percentile(samples, 95), "ms")
+
+    # The same request through the ASGI adapter, sent in several chunks without a Content-Length
+    import asgi
+    payload = json.dumps({"review": review}).encode('utf-8')
+    chunks = [payload[i:i + 16] for i in range(0, len(payload), 16)]
+    samples = latencies(lambda: asgi_post(asgi.application, '/predict_sentiment', chunks, 'application/json'), args.repeat)
+    record("asgi_chunked_predict_p50", percentile(samples, 50), "ms")
+
+    batch = synthetic_reviews(args.batch)
+    predict_ms = median_ms(lambda: shopinion.model.predict(batch), args.samples)
+    record(f"batch_predict_reviews_per_s[{args.batch}]", args.batch / predict_ms * 1000, "reviews/s", "higher")
+    explain_ms = median_ms(lambda: shopinion.predict_with_explanations(batch), args.samples)
+    record(f"batch_explain_reviews_per_s[{args.batch}]", args.batch / explain_ms * 1000, "reviews/s", "higher")
+    record("explain_overhead_factor", explain_ms / predict_ms, "x")
+
+    record(f"wordcloud_ms[{args.batch}]", median_ms(lambda: shopinion.render_wordcloud(" ".join(batch)), args.samples), "ms")
+
+    record(f"analyze_reviews_json_ms[{args.batch}]", median_ms(
+        lambda: check_response(client.post('/analyze_reviews', json={"reviews": batch})), args.samples), "ms")
+
+    record(f"analyze_reviews_explain_ms[{args.batch}]", median_ms(
+        lambda: check_response(client.post('/analyze_reviews', json={"reviews": batch, "explain": True})), args.samples), "ms")
+
+    upload = synthetic_upload_csv(args.batch)
+    record(f"analyze_reviews_csv_ms[{args.batch}]", median_ms(lambda: check_response(client.post(
+        '/analyze_reviews', data={"csv_file": (io.BytesIO(upload), 'upload.csv')}, content_type='multipart/form-data')),
+        args.samples), "ms")
+
+    analysis = check_response(client.post('/analyze_reviews', json={"reviews": batch})).get_json()["analysis"]
+    download_ms = median_ms(lambda: check_response(client.post('/download_results', json={"analysis": analysis})), args.samples)
+    record("download_results_rows_per_s", len(analysis) / download_ms * 1000, "rows/s", "higher")
+
+    wav = synthetic_wav()
+    samples = latencies(lambda: check_response(client.post(
+        '/analyze_voice', data={"audio_file": (io.BytesIO(wav), 'review.wav')}, content_type='multipart/form-data')),
+        max(1, args.repeat // 10))
+    record("analyze_voice_p50", percentile(samples, 50), "ms")
+
+    # Concurrent load: interactive predictions mixed with the occasional bulk request.
+    # Bulk requests past the admission budget are shed with 429 and counted, not treated as failures.
+    def worker(i):
+        local_client = shopinion.app.test_client()
+        if i % 20 == 0:
+            elapsed, response = timed(local_client.post, '/analyze_reviews', json={"reviews": batch[:200]})
+            if response.status_code != 429:
+                check_response(response)
+            return "bulk", elapsed * 1000, response.status_code
+        elapsed, response = timed(local_client.post, '/predict_sentiment', json={"review": review})
+        check_response(response)
+        return "interactive", elapsed * 1000, response.status_code
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=args.concurrency) as pool:
+        outcomes = list(pool.map(worker, range(args.requests)))
+    elapsed = time.perf_counter() - start
+    samples = [ms for _, ms, status in outcomes if status == 200]
+    interactive = [ms for kind, ms, _ in outcomes if kind == "interactive"]
+    record(f"concurrent_throughput_rps[{args.concurrency}]", len(samples) / elapsed, "req/s", "higher")
+    record(f"concurrent_p95[{args.concurrency}]", percentile(samples, 95), "ms")
+    record("concurrent_mean", statistics.mean(samples), "ms")
+    record(f"concurrent_interactive_p95[{args.concurrency}]", percentile(interactive, 95), "ms")
+    record("concurrent_bulk_rejected", sum(status == 429 for _, _, status in outcomes), "requests")
+
+    rss = peak_rss_mb()
+    if rss is not None:
+        record("peak_rss_mb", rss, "MB")
+
+    return metrics
+
+
+def compare(metrics, baseline, threshold):
+    """Return the metrics that regressed by more than threshold (a fraction) against baseline."""
+    regressions = []
+    for name, current in metrics.items():
+        previous = baseline.get(name)
+        if not previous or not previous["value"]:
+            continue
+        change = (current["value"] - previous["value"]) / previous["value"]
+        if current["better"] == "higher":
+            change = -change
+        if change > threshold:
+            regressions.append((name, previous["value"], current["value"], change))
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Offline performance benchmarks for Shopinion.")
+    parser.add_argument("--sizes", default="1000,10000,50000", help="comma-separated train.csv row counts")
+    parser.add_argument("--batch", type=int, default=2000, help="reviews per bulk request")
+    parser.add_argument("--repeat", type=int, default=200, help="samples for single-request latency")
+    parser.add_argument("--samples", type=int, default=5,
+                        help="timed runs per training and bulk metric (the median is reported, after one warm-up)")
+    parser.add_argument("--concurrency", type=int, default=8, help="threads for the concurrent load test")
+    parser.add_argument("--requests", type=int, default=400, help="requests in the concurrent load test")
+    parser.add_argument("--baseline", default=DEFAULT_BASELINE, help="baseline JSON file")
+    parser.add_argument("--save-baseline", action="store_true", help="write the results to --baseline")
+    parser.add_argument("--check", action="store_true", help="compare against --baseline and fail on regressions")
+    parser.add_argument("--threshold", type=float, default=0.25, help="allowed regression as a fraction (0.25 = 25%%)")
+    parser.add_argument("--output", help="also write the results as JSON to this file")
+    args = parser.parse_args()
+
+    metrics = run(args)
+    results = {
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+        "metrics": metrics,
+    }
+
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(results, f, indent=2)
+
+    if args.save_baseline:
+        with open(args.baseline, 'w', encoding='utf-8') as f:
+            json.dump(results, f, indent=2)
+        print(f"Baseline written to {args.baseline}")
+
+    if args.check:
+        try:
+            with open(args.baseline, encoding='utf-8') as f:
+                baseline = json.load(f)["metrics"]
+        except FileNotFoundError:
+            print(f"Error: no baseline at {args.baseline}. Run with --save-baseline first.")
+            return 2
+        regressions = compare(metrics, baseline, args.threshold)
+        for name, before, after, change in regressions:
+            print(f"REGRESSION {name}: {before} -> {after} ({change:+.0%})")
+        if regressions:
+            return 1
+        print(f"No regressions beyond {args.threshold:.0%}.")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
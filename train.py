@@ -0,0 +1,253 @@
+"""Train the Shopinion sentiment model, optionally with a hyperparameter search.
+
+    python train.py                                   # search the default grid, write model.joblib
+    python train.py --ngrams 1,2 --min-df 1,3 --C 0.5,1,2
+    python train.py --max-predict-ms 2 --max-model-mb 20
+
+train.csv is tokenized once into a cached sparse document-term matrix of n-gram counts.
+Every candidate vectorizer (n-gram range, min_df, sublinear tf) is then a column selection
+plus a TF-IDF reweighting of that cache, never a re-tokenization. Vectorizer candidates run
+in parallel on all cores. Within each one, the C values are fitted in ascending order with
+warm starts. Single-review predict latency is measured afterwards, serially, so fits running
+on other cores do not inflate it. The best model that fits the latency/size budget is saved
+for app.py, along with a report of accuracy against fit time, predict latency and model size.
+"""
+import argparse
+import copy
+import hashlib
+import itertools
+import json
+import os
+import pickle
+import statistics
+import time
+
+import joblib
+import numpy as np
+import pandas as pd
+from sklearn.feature_extraction.text import CountVectorizer, TfidfTransformer, TfidfVectorizer
+from sklearn.linear_model import LogisticRegression
+from sklearn.metrics import accuracy_score
+from sklearn.model_selection import train_test_split
+from sklearn.pipeline import Pipeline
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+
+
+# --- Step 1: Load and Prepare Training Data from CSV ---
+def map_rating_to_sentiment(rating):
+    if rating in [4, 5]:
+        return 'Positive'
+    elif rating == 3:
+        return 'Neutral'
+    elif rating in [1, 2]:
+        return 'Negative'
+    return None
+
+
+def load_training_data(path):
+    df = pd.read_csv(path)
+    df.dropna(subset=['Review Text'], inplace=True)
+    df['sentiment'] = df['Rating'].apply(map_rating_to_sentiment)
+    df.dropna(subset=['sentiment'], inplace=True)
+    return df['Review Text'], df['sentiment']
+
+
+# --- Step 2: Train ML Model (Logistic Regression with TF-IDF) ---
+def train_model(X, y):
+    """Fit the default sentiment pipeline on a held-out split and return (model, test accuracy)."""
+    X_train, X_test, y_train, y_test = train_test_split(X, y, test_size=0.2, random_state=42)
+
+    model = Pipeline([
+        ("tfidf", TfidfVectorizer()),
+        ("logreg", LogisticRegression(max_iter=1000))
+    ])
+    model.fit(X_train, y_train)
+
+    # Calculate model accuracy for display
+    y_pred = model.predict(X_test)
+    return model, accuracy_score(y_test, y_pred)
+
+
+# --- Tokenization cache ---
+def load_or_build_counts(data_path, max_ngram, cache_dir):
+    """Return (texts, labels, counts, terms), tokenizing data_path at most once per content and n-gram size."""
+    with open(data_path, 'rb') as f:
+        digest = hashlib.sha256(f.read()).hexdigest()[:16]
+    cache_path = os.path.join(cache_dir, f"counts-{digest}-ngram{max_ngram}.joblib")
+
+    if os.path.exists(cache_path):
+        print(f"Using cached document-term matrix {cache_path}")
+        return joblib.load(cache_path)
+
+    texts, labels = load_training_data(data_path)
+    # Same tokenizer settings as TfidfVectorizer's defaults, so cached columns match what it would produce
+    vectorizer = CountVectorizer(ngram_range=(1, max_ngram), dtype=np.float64)
+    start = time.perf_counter()
+    counts = vectorizer.fit_transform(texts).tocsr()
+    print(f"Tokenized {counts.shape[0]} reviews into {counts.shape[1]} n-grams in {time.perf_counter() - start:.1f}s")
+
+    cached = (texts.tolist(), labels.to_numpy(), counts, vectorizer.get_feature_names_out())
+    os.makedirs(cache_dir, exist_ok=True)
+    joblib.dump(cached, cache_path)
+    return cached
+
+
+# --- Search ---
+def build_pipeline(terms, ngram_max, sublinear_tf, idf, classifier):
+    """A raw-text Pipeline equivalent to the cached-matrix model, without refitting on the corpus."""
+    vectorizer = TfidfVectorizer(ngram_range=(1, ngram_max), vocabulary=terms, sublinear_tf=sublinear_tf)
+    vectorizer.fit(terms[:1])
+    vectorizer.idf_ = idf
+    return Pipeline([("tfidf", vectorizer), ("logreg", classifier)])
+
+
+def predict_latency_ms(pipeline, samples):
+    latencies = []
+    for text in samples:
+        start = time.perf_counter()
+        pipeline.predict([text])
+        latencies.append((time.perf_counter() - start) * 1000)
+    return statistics.median(latencies)
+
+
+def search_vectorizer(counts, terms, labels, train_idx, test_idx, ngram_max, min_df, sublinear_tf, Cs, keep_pipelines=False):
+    """Evaluate every C for one vectorizer setting, warm-starting each fit from the previous one."""
+    start = time.perf_counter()
+    train_counts = counts[train_idx]
+    keep = np.asarray((train_counts > 0).sum(axis=0)).ravel() >= min_df
+    # The cache holds n-grams up to the largest size searched; drop the longer ones
+    keep &= np.char.count(terms.astype(str), " ") < ngram_max
+    columns = np.flatnonzero(keep)
+
+    transformer = TfidfTransformer(sublinear_tf=sublinear_tf)
+    X_train = transformer.fit_transform(train_counts[:, columns])
+    X_test = transformer.transform(counts[test_idx][:, columns])
+    y_train, y_test = labels[train_idx], labels[test_idx]
+    vectorize_seconds = time.perf_counter() - start
+
+    results = []
+    classifier = LogisticRegression(max_iter=1000, warm_start=True)
+    for C in sorted(Cs):
+        classifier.set_params(C=C)
+        start = time.perf_counter()
+        classifier.fit(X_train, y_train)
+        fit_seconds = vectorize_seconds + time.perf_counter() - start
+        accuracy = accuracy_score(y_test, classifier.predict(X_test))
+
+        pipeline = build_pipeline(terms[columns], ngram_max, sublinear_tf, transformer.idf_, copy.deepcopy(classifier))
+        result = {
+            "params": {"ngram_max": ngram_max, "min_df": min_df, "sublinear_tf": sublinear_tf, "C": C},
+            "accuracy": round(accuracy, 4),
+            "fit_seconds": round(fit_seconds, 3),
+            "predict_ms": None,
+            "model_bytes": len(pickle.dumps(pipeline)),
+            "n_features": len(columns),
+        }
+        # Pipelines stay in the worker unless asked for; the search only needs their measurements
+        if keep_pipelines:
+            result["pipeline"] = pipeline
+        results.append(result)
+    return results
+
+
+def vectorizer_params(result):
+    params = result["params"]
+    return params["ngram_max"], params["min_df"], params["sublinear_tf"]
+
+
+def select_best(results, replay, latency_samples, max_predict_ms=None, max_model_mb=None):
+    """Most accurate candidate within the budgets, preferring the faster one on ties.
+
+    Returns (result, pipeline). Latency is measured here, one accuracy level at a time from
+    the top, until a level has a candidate within the latency budget; replay(ngram_max,
+    min_df, sublinear_tf, max_C) rebuilds a setting's pipelines up to max_C to time them.
+    Unmeasured candidates keep predict_ms None.
+    """
+    sized = [r for r in results if max_model_mb is None or r["model_bytes"] <= max_model_mb * 1024 * 1024]
+    for accuracy in sorted({r["accuracy"] for r in sized}, reverse=True):
+        best = best_pipeline = None
+        level = sorted((r for r in sized if r["accuracy"] == accuracy), key=vectorizer_params)
+        for settings, group in itertools.groupby(level, key=vectorizer_params):
+            group = list(group)
+            replayed = replay(*settings, max(r["params"]["C"] for r in group))
+            pipelines = {r["params"]["C"]: r["pipeline"] for r in replayed}
+            for r in group:
+                pipeline = pipelines[r["params"]["C"]]
+                r["predict_ms"] = round(predict_latency_ms(pipeline, latency_samples), 3)
+                if ((max_predict_ms is None or r["predict_ms"] <= max_predict_ms)
+                        and (best is None or r["predict_ms"] < best["predict_ms"])):
+                    best, best_pipeline = r, pipeline
+        if best is not None:
+            return best, best_pipeline
+    return None, None
+
+
+def parse_list(value, cast):
+    return [cast(v) for v in value.split(',') if v]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Train the Shopinion sentiment model with a cached-tokenization grid search.")
+    parser.add_argument("--data", default=os.path.join(BASE_DIR, 'train.csv'), help="training CSV with 'Review Text' and 'Rating'")
+    parser.add_argument("--output", default=os.path.join(BASE_DIR, 'model.joblib'), help="where to write the best model")
+    parser.add_argument("--report", default=os.path.join(BASE_DIR, 'training_report.json'), help="where to write the search report")
+    parser.add_argument("--cache-dir", default=os.path.join(BASE_DIR, '.train_cache'), help="tokenization cache directory")
+    parser.add_argument("--ngrams", default="1,2", help="comma-separated maximum n-gram sizes")
+    parser.add_argument("--min-df", default="1,2,5", help="comma-separated min_df values")
+    parser.add_argument("--sublinear-tf", default="false,true", help="comma-separated sublinear_tf values")
+    parser.add_argument("--C", default="0.1,0.3,1,3,10", help="comma-separated inverse regularization strengths")
+    parser.add_argument("--n-jobs", type=int, default=-1, help="parallel vectorizer candidates (-1 = all cores)")
+    parser.add_argument("--max-predict-ms", type=float, help="only select models at or under this single-review latency")
+    parser.add_argument("--max-model-mb", type=float, help="only select models at or under this pickled size")
+    args = parser.parse_args()
+
+    ngrams = parse_list(args.ngrams, int)
+    min_dfs = parse_list(args.min_df, int)
+    sublinear = parse_list(args.sublinear_tf, lambda v: v.strip().lower() in ("1", "true", "yes"))
+    Cs = parse_list(args.C, float)
+
+    texts, labels, counts, terms = load_or_build_counts(args.data, max(ngrams), args.cache_dir)
+    train_idx, test_idx = train_test_split(np.arange(len(labels)), test_size=0.2, random_state=42)
+    latency_samples = [texts[i] for i in test_idx[:100]]
+
+    candidates = list(itertools.product(ngrams, min_dfs, sublinear))
+    print(f"Searching {len(candidates)} vectorizer settings x {len(Cs)} C values")
+    batches = joblib.Parallel(n_jobs=args.n_jobs)(
+        joblib.delayed(search_vectorizer)(counts, terms, labels, train_idx, test_idx, n, m, s, Cs)
+        for n, m, s in candidates)
+    results = sorted(itertools.chain.from_iterable(batches), key=lambda r: -r["accuracy"])
+
+    # Replay a setting's warm-start path up to max_C to get the exact fitted pipelines back
+    def replay(ngram_max, min_df, sublinear_tf, max_C):
+        return search_vectorizer(counts, terms, labels, train_idx, test_idx, ngram_max, min_df, sublinear_tf,
+                                 [C for C in Cs if C <= max_C], keep_pipelines=True)
+
+    best, best_pipeline = select_best(results, replay, latency_samples, args.max_predict_ms, args.max_model_mb)
+
+    print(f"{'accuracy':>8} {'fit s':>7} {'pred ms':>8} {'size MB':>8} {'features':>9}  params")
+    for r in results:
+        predict_ms = "-" if r["predict_ms"] is None else f"{r['predict_ms']:.3f}"
+        print(f"{r['accuracy']:>8.4f} {r['fit_seconds']:>7.2f} {predict_ms:>8} "
+              f"{r['model_bytes'] / 1024 / 1024:>8.2f} {r['n_features']:>9}  {r['params']}")
+
+    report = {
+        "data": os.path.abspath(args.data),
+        "budget": {"max_predict_ms": args.max_predict_ms, "max_model_mb": args.max_model_mb},
+        "best": best,
+        "candidates": results,
+    }
+    with open(args.report, 'w', encoding='utf-8') as f:
+        json.dump(report, f, indent=2)
+    print(f"Report written to {args.report}")
+
+    if best is None:
+        print("Error: no candidate fits the latency/size budget; no model written.")
+        return 1
+    joblib.dump({"model": best_pipeline, "accuracy": best["accuracy"], "params": best["params"]}, args.output)
+    print(f"Best model {best['params']} (accuracy {best['accuracy']:.4f}) written to {args.output}")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())